@@ -0,0 +1,160 @@
+import hashlib
+import logging
+import os
+import threading
+from typing import List, Dict, Any, Optional, Tuple
+import anyio
+import orjson
+from anyio import to_thread
+from cachetools import TTLCache
+from app.config import settings
+from app.models import ConversationHistory
+
+logger = logging.getLogger(__name__)
+
+class ChatCache:
+    """
+    Two-tier cache for chat responses
+
+    The exact tier is a TTL cache keyed on the normalized message, the (already
+    rounded) user location and the conversation history. The optional semantic tier
+    embeds the message and finds near-duplicate questions asked in the same
+    context, mapping them back onto an exact-tier entry.
+    """
+
+    def __init__(self):
+        self._cache = TTLCache(maxsize=settings.CHAT_CACHE_SIZE, ttl=settings.CHAT_CACHE_TTL)
+        self._lock = threading.Lock()
+        self.enabled = settings.CHAT_CACHE_TTL > 0
+
+        # Semantic tier state, populated lazily on first use
+        self.semantic_enabled = self.enabled and settings.CHAT_SEMANTIC_CACHE
+        self.threshold = settings.CHAT_SEMANTIC_THRESHOLD
+        self._encoder = None
+        self._index = None
+        self._index_lock = threading.RLock()
+        # Embedding is CPU-bound and runs in worker threads bounded to the core count;
+        # the limiter needs a running event loop, so it is created on first use
+        self._embed_limiter: Optional[anyio.CapacityLimiter] = None
+        self._entries: List[Tuple[str, str]] = []  # (context key, exact key) per index row
+
+    def context_key(self, conversation_history: ConversationHistory, user_location: Optional[str]) -> str:
+        """Hash everything besides the message that shapes the response"""
+        # Endpoints already round the location with canonical_location()
+        digest = hashlib.sha256((user_location or "").encode("utf-8"))
+        for msg in conversation_history:
+            if isinstance(msg, dict):
+                fields = [msg["role"], msg["content"]]
+            else:
+                fields = [msg.role, msg.content]
+            digest.update(orjson.dumps(fields))
+        return digest.hexdigest()
+
+    @staticmethod
+    def exact_key(message: str, context_key: str) -> str:
+        raw = f"{message.lower().strip()}|{context_key}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _load_semantic(self) -> bool:
+        """Load the embedding model and FAISS index, disabling the tier if unavailable"""
+        with self._index_lock:
+            if self._index is not None:
+                return True
+            try:
+                import faiss
+                from sentence_transformers import SentenceTransformer
+            except ImportError:
+                logger.warning("sentence-transformers/faiss not installed, semantic chat cache disabled")
+                self.semantic_enabled = False
+                return False
+
+            self._encoder = SentenceTransformer(settings.CHAT_CACHE_EMBED_MODEL)
+            self._index = faiss.IndexFlatIP(self._encoder.get_sentence_embedding_dimension())
+            return True
+
+    async def _embed_async(self, message: str):
+        """Load the model if needed and embed a message off the event loop, None if unavailable"""
+        if self._embed_limiter is None:
+            self._embed_limiter = anyio.CapacityLimiter(os.cpu_count() or 1)
+        if not await to_thread.run_sync(self._load_semantic, limiter=self._embed_limiter):
+            return None
+        return await to_thread.run_sync(self._embed, message, limiter=self._embed_limiter)
+
+    def _embed(self, message: str):
+        """Embed a message as a normalized float32 row vector"""
+        return self._encoder.encode(
+            [message.lower().strip()],
+            normalize_embeddings=True,
+            convert_to_numpy=True
+        ).astype("float32")
+
+    async def _semantic_lookup(self, message: str, context_key: str) -> Optional[Dict[str, Any]]:
+        embedding = await self._embed_async(message)
+        if embedding is None:
+            return None
+
+        # Flat search over a few thousand rows is fast enough to run inline
+        with self._index_lock:
+            if self._index.ntotal == 0:
+                return None
+            scores, rows = self._index.search(embedding, min(5, self._index.ntotal))
+            matches = [self._entries[row] for score, row in zip(scores[0], rows[0]) if score >= self.threshold]
+
+        with self._lock:
+            for entry_context, key in matches:
+                if entry_context == context_key and key in self._cache:
+                    return self._cache[key]
+        return None
+
+    async def _semantic_insert(self, message: str, context_key: str, key: str) -> None:
+        embedding = await self._embed_async(message)
+        if embedding is None:
+            return
+
+        with self._index_lock:
+            # Flat indexes cannot delete rows, so rebuild once expired entries pile up
+            if self._index.ntotal >= 2 * self._cache.maxsize:
+                self._index.reset()
+                self._entries = []
+            self._index.add(embedding)
+            self._entries.append((context_key, key))
+
+    async def get(
+        self,
+        message: str,
+        conversation_history: ConversationHistory,
+        user_location: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Return a cached chat result for this message and context, if any"""
+        if not self.enabled:
+            return None
+
+        context = self.context_key(conversation_history, user_location)
+        with self._lock:
+            result = self._cache.get(self.exact_key(message, context))
+        if result is not None or not self.semantic_enabled:
+            return result
+
+        return await self._semantic_lookup(message, context)
+
+    async def set(
+        self,
+        message: str,
+        conversation_history: ConversationHistory,
+        user_location: Optional[str],
+        result: Dict[str, Any]
+    ) -> None:
+        """Store a chat result for this message and context"""
+        if not self.enabled:
+            return
+
+        context = self.context_key(conversation_history, user_location)
+        key = self.exact_key(message, context)
+        with self._lock:
+            self._cache[key] = result
+
+        if self.semantic_enabled:
+            await self._semantic_insert(message, context, key)
+
+# Singleton instance
+chat_cache = ChatCache()
@@ -1,20 +1,50 @@
 import os
+from dataclasses import dataclass, field, fields
+from typing import Any
 from dotenv import load_dotenv
 
-load_dotenv()
+# In production the environment is provided by the deployment, skip reading .env
+if os.getenv("APP_ENV") != "production":
+    load_dotenv()
 
+@dataclass(slots=True, frozen=True)
 class Settings:
     # Google Maps API
-    GOOGLE_MAPS_API_KEY: str = os.getenv("GOOGLE_MAPS_API_KEY", "")
+    GOOGLE_MAPS_API_KEY: str = field(default="", repr=False)
 
     # LLM Configuration
-    LLM_BASE_URL: str = os.getenv("LLM_BASE_URL", "http://localhost:11434/v1")
-    LLM_API_KEY: str = os.getenv("LLM_API_KEY", "")
-    LLM_MODEL: str = os.getenv("LLM_MODEL", "llama3")
+    LLM_BASE_URL: str = "http://localhost:11434/v1"
+    LLM_API_KEY: str = field(default="", repr=False)
+    LLM_MODEL: str = "llama3"
+    LLM_HISTORY_TURNS: int = 8  # user/assistant turns sent to the LLM
+    LLM_HEDGE_MS: int = 0  # 0 disables hedged requests
+
+    # Chat Response Cache
+    CHAT_CACHE_TTL: int = 600  # seconds, 0 disables caching
+    CHAT_CACHE_SIZE: int = 2048
+    CHAT_SEMANTIC_CACHE: bool = False
+    CHAT_SEMANTIC_THRESHOLD: float = 0.92
+    CHAT_CACHE_EMBED_MODEL: str = "all-MiniLM-L6-v2"
 
     # Application Configuration
-    APP_HOST: str = os.getenv("APP_HOST", "0.0.0.0")
-    APP_PORT: int = int(os.getenv("APP_PORT", "8000"))
-    DEBUG: bool = os.getenv("DEBUG", "True").lower() == "true"
+    APP_HOST: str = "0.0.0.0"
+    APP_PORT: int = 8000
+    DEBUG: bool = True
+    CORS_ORIGINS: str = "http://localhost:8000"  # comma-separated list of allowed origins
+
+def _cast(value: str, field_type: type) -> Any:
+    """Convert an environment variable string to the field's type"""
+    if field_type is bool:
+        return value.lower() == "true"
+    return field_type(value)
+
+def load_settings() -> Settings:
+    """Build settings from the environment, falling back to the field defaults"""
+    values = {}
+    for setting in fields(Settings):
+        value = os.getenv(setting.name)
+        if value is not None:
+            values[setting.name] = _cast(value, setting.type)
+    return Settings(**values)
 
-settings = Settings()
+settings = load_settings()
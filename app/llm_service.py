@@ -1,100 +1,258 @@
-import json
-from typing import List, Dict, Any, Optional
-from openai import OpenAI
+import asyncio
+import orjson
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple
+import httpx
+from openai import AsyncOpenAI
 from app.config import settings
 from app.maps_client import maps_client
+from app.chat_cache import chat_cache
+from app.models import ConversationHistory
+
+# Parameters shared by the place search functions
+_SEARCH_PLACES_PARAMETERS: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "query": {
+            "type": "string",
+            "description": "The search query (e.g., 'Italian restaurants', 'coffee shops near me')"
+        },
+        "location": {
+            "type": "string",
+            "description": "The location to search near (address or 'current location')"
+        },
+        "radius": {
+            "type": "integer",
+            "description": "Search radius in meters (default 5000)",
+            "default": 5000
+        },
+        "place_type": {
+            "type": "string",
+            "description": "Type of place (restaurant, cafe, bar, etc.)",
+            "enum": ["restaurant", "cafe", "bar", "store", "park", "museum"]
+        }
+    },
+    "required": ["query"]
+}
+
+# Functions available for the LLM to call, built once at import time
+_FUNCTION_DEFS: Tuple[Dict[str, Any], ...] = (
+    {
+        "name": "search_places",
+        "description": "Search for places, restaurants, or points of interest based on user query. Use this when user asks for recommendations or locations.",
+        "parameters": _SEARCH_PLACES_PARAMETERS
+    },
+    {
+        "name": "search_places_with_details",
+        "description": "Search for places and return full details (opening hours, phone, website, reviews) for the top results in one call. Use this when user asks about details such as hours, contact info or reviews of recommended places.",
+        "parameters": _SEARCH_PLACES_PARAMETERS
+    },
+    {
+        "name": "get_directions",
+        "description": "Get directions between two locations. Use when user asks for directions or route information.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "origin": {
+                    "type": "string",
+                    "description": "Starting location (address or 'current location')"
+                },
+                "destination": {
+                    "type": "string",
+                    "description": "Destination location or place name"
+                },
+                "mode": {
+                    "type": "string",
+                    "description": "Travel mode",
+                    "enum": ["driving", "walking", "bicycling", "transit"],
+                    "default": "driving"
+                }
+            },
+            "required": ["origin", "destination"]
+        }
+    }
+)
+
+# Function definitions wrapped in the tools format used by the chat completions API
+_TOOLS: Tuple[Dict[str, Any], ...] = tuple({"type": "function", "function": d} for d in _FUNCTION_DEFS)
+
+# Place fields forwarded to the LLM; the full objects only go to the frontend
+_PLACE_FIELDS = ("name", "formatted_address", "rating", "user_ratings_total", "place_id")
+_PLACE_DETAIL_FIELDS = ("formatted_phone_number", "website", "price_level")
+_MAX_PLACE_TYPES = 3
+_MAX_PLACE_REVIEWS = 3
+
+def _project_place(place: Dict[str, Any], with_details: bool = False) -> Dict[str, Any]:
+    """Reduce a Google Places result to the fields the LLM needs to answer"""
+    fields = _PLACE_FIELDS + _PLACE_DETAIL_FIELDS if with_details else _PLACE_FIELDS
+    projected = {field: place[field] for field in fields if field in place}
+
+    location = place.get("geometry", {}).get("location")
+    if location:
+        projected["location"] = location
+    if place.get("types"):
+        projected["types"] = place["types"][:_MAX_PLACE_TYPES]
+
+    if with_details:
+        opening_hours = place.get("opening_hours", {})
+        if "weekday_text" in opening_hours:
+            projected["opening_hours"] = opening_hours["weekday_text"]
+        if place.get("reviews"):
+            projected["reviews"] = [
+                {"rating": review.get("rating"), "text": review.get("text")}
+                for review in place["reviews"][:_MAX_PLACE_REVIEWS]
+            ]
+
+    return projected
+
+@lru_cache(maxsize=1024)
+def _system_prompt(user_location: Optional[str]) -> str:
+    """
+    Build the system prompt for a user location
+
+    Cached so repeated requests from the same location reuse a byte-identical
+    prompt, which also lets the LLM server's prefix cache kick in.
+    """
+    return f"""You are a helpful location assistant that helps users find places and get directions.
+You have access to Google Maps data and can search for places and provide directions.
+
+User's current location coordinates: {user_location or 'Not provided'}
+
+CRITICAL INSTRUCTIONS:
+1. When users ask for places "near me", "nearby", or any location recommendations, you MUST call the search_places function
+2. ALWAYS set location parameter to "current location" when the user wants places near them
+3. DO NOT make up or invent place names, addresses, or ratings
+4. ONLY present actual results from the search_places function
+5. If search_places returns no results, say so - don't fabricate data
+
+When calling search_places:
+- Set location to "current location" (this will use coordinates: {user_location})
+- The function will return real places from Google Maps
+
+When users ask about opening hours, phone numbers, websites or reviews:
+- Use the search_places_with_details function instead of search_places
+
+When users ask for directions:
+- Use the get_directions function with actual place names from search results"""
 
 class LLMService:
     def __init__(self):
-        self.client = OpenAI(
-            base_url=settings.LLM_BASE_URL,
-            api_key=settings.LLM_API_KEY or "not-needed"
-        )
+        self.client: Optional[AsyncOpenAI] = None
         self.model = settings.LLM_MODEL
+        self.hedge_delay = settings.LLM_HEDGE_MS / 1000
+        self.start()
 
-    def get_function_definitions(self) -> List[Dict[str, Any]]:
-        """Define available functions for the LLM to call"""
-        return [
-            {
-                "name": "search_places",
-                "description": "Search for places, restaurants, or points of interest based on user query. Use this when user asks for recommendations or locations.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "query": {
-                            "type": "string",
-                            "description": "The search query (e.g., 'Italian restaurants', 'coffee shops near me')"
-                        },
-                        "location": {
-                            "type": "string",
-                            "description": "The location to search near (address or 'current location')"
-                        },
-                        "radius": {
-                            "type": "integer",
-                            "description": "Search radius in meters (default 5000)",
-                            "default": 5000
-                        },
-                        "place_type": {
-                            "type": "string",
-                            "description": "Type of place (restaurant, cafe, bar, etc.)",
-                            "enum": ["restaurant", "cafe", "bar", "store", "park", "museum"]
-                        }
-                    },
-                    "required": ["query"]
-                }
-            },
-            {
-                "name": "get_directions",
-                "description": "Get directions between two locations. Use when user asks for directions or route information.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "origin": {
-                            "type": "string",
-                            "description": "Starting location (address or 'current location')"
-                        },
-                        "destination": {
-                            "type": "string",
-                            "description": "Destination location or place name"
-                        },
-                        "mode": {
-                            "type": "string",
-                            "description": "Travel mode",
-                            "enum": ["driving", "walking", "bicycling", "transit"],
-                            "default": "driving"
-                        }
-                    },
-                    "required": ["origin", "destination"]
-                }
-            }
-        ]
+    def start(self) -> None:
+        """Create the shared LLM client (called at app startup, no-op if it already exists)"""
+        if self.client is None:
+            # Async client with a pooled, keep-alive HTTP transport shared across requests
+            self.client = AsyncOpenAI(
+                base_url=settings.LLM_BASE_URL,
+                api_key=settings.LLM_API_KEY or "not-needed",
+                http_client=httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=100,
+                        max_keepalive_connections=50,
+                        keepalive_expiry=180
+                    )
+                )
+            )
+
+    async def warm_up(self) -> None:
+        """Open a keep-alive connection to the LLM backend ahead of the first request"""
+        # Short timeout and no retries so an unresponsive backend cannot stall startup
+        await self.client.with_options(timeout=5.0, max_retries=0).models.list()
+
+    async def close(self) -> None:
+        """Close the shared LLM client (called at app shutdown)"""
+        if self.client is not None:
+            await self.client.close()
+            self.client = None
+
+    async def _delayed_create(self, delay: float, **kwargs):
+        """Issue a completion request after waiting for the given delay"""
+        await asyncio.sleep(delay)
+        return await self.client.chat.completions.create(**kwargs)
+
+    async def create_hedged(self, **kwargs):
+        """
+        Create a chat completion with a hedged backup request
+
+        If the primary request has not finished after LLM_HEDGE_MS, an identical
+        request is fired and whichever returns first wins; the other is cancelled.
+        Hedging is disabled when LLM_HEDGE_MS is 0.
+        """
+        if self.hedge_delay <= 0:
+            return await self.client.chat.completions.create(**kwargs)
+
+        primary = asyncio.create_task(self.client.chat.completions.create(**kwargs))
+        hedge = asyncio.create_task(self._delayed_create(self.hedge_delay, **kwargs))
+        pending = {primary, hedge}
+
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                # Both requests failed: surface the last error
+                if not pending:
+                    return done.pop().result()
+        finally:
+            for task in pending:
+                task.cancel()
 
-    def execute_function(self, function_name: str, arguments: Dict[str, Any], user_location: Optional[str] = None) -> Dict[str, Any]:
+    def get_function_definitions(self) -> Tuple[Dict[str, Any], ...]:
+        """Define available functions for the LLM to call, in the tools format"""
+        return _TOOLS
+
+    async def execute_function(self, function_name: str, arguments: Dict[str, Any], user_location: Optional[str] = None) -> Dict[str, Any]:
         """Execute a function call from the LLM"""
-        if function_name == "search_places":
+        if function_name in ("search_places", "search_places_with_details"):
             # Use user's actual location if not specified in arguments
             search_location = arguments.get("location")
             if not search_location or search_location == "current location":
                 search_location = user_location
 
-            places = maps_client.search_places(
+        if function_name == "search_places_with_details":
+            places = await maps_client.get_places_with_details(
                 query=arguments.get("query"),
                 location=search_location,
                 radius=arguments.get("radius", 5000),
                 place_type=arguments.get("place_type")
             )
+            if places is None:
+                return {"success": False, "error": "Place search failed"}
+            return {
+                "success": True,
+                "places": places,
+                "count": len(places)
+            }
+
+        elif function_name == "search_places":
+            places = await maps_client.search_places(
+                query=arguments.get("query"),
+                location=search_location,
+                radius=arguments.get("radius", 5000),
+                place_type=arguments.get("place_type"),
+                limit=5
+            )
+            if places is None:
+                return {"success": False, "error": "Place search failed"}
             return {
                 "success": True,
-                "places": places[:5],  # Limit to top 5 results
+                "places": places,
                 "count": len(places)
             }
 
         elif function_name == "get_directions":
-            directions = maps_client.get_directions(
+            directions = await maps_client.get_directions(
                 origin=arguments.get("origin"),
                 destination=arguments.get("destination"),
                 mode=arguments.get("mode", "driving")
             )
+            if directions is None:
+                return {"success": False, "error": "Directions lookup failed"}
             return {
                 "success": True,
                 "routes": directions
@@ -105,7 +263,7 @@ class LLMService:
     async def chat(
         self,
         message: str,
-        conversation_history: Optional[List[Dict[str, str]]] = None,
+        conversation_history: Optional[ConversationHistory] = None,
         user_location: Optional[str] = None
     ) -> Dict[str, Any]:
         """
@@ -116,103 +274,292 @@ class LLMService:
         """
         if conversation_history is None:
             conversation_history = []
+        conversation_history = self._trim_history(conversation_history)
 
-        # Build messages for the LLM
-        messages = [
-            {
-                "role": "system",
-                "content": f"""You are a helpful location assistant that helps users find places and get directions.
-You have access to Google Maps data and can search for places and provide directions.
+        cached = await chat_cache.get(message, conversation_history, user_location)
+        if cached is not None:
+            return cached
 
-User's current location coordinates: {user_location or 'Not provided'}
+        result, cacheable = await self._run_chat(message, conversation_history, user_location)
+        if cacheable:
+            await chat_cache.set(message, conversation_history, user_location, result)
+        return result
 
-CRITICAL INSTRUCTIONS:
-1. When users ask for places "near me", "nearby", or any location recommendations, you MUST call the search_places function
-2. ALWAYS set location parameter to "current location" when the user wants places near them
-3. DO NOT make up or invent place names, addresses, or ratings
-4. ONLY present actual results from the search_places function
-5. If search_places returns no results, say so - don't fabricate data
+    async def chat_stream(
+        self,
+        message: str,
+        conversation_history: Optional[ConversationHistory] = None,
+        user_location: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Process chat message, streaming the response as it is generated
 
-When calling search_places:
-- Set location to "current location" (this will use coordinates: {user_location})
-- The function will return real places from Google Maps
+        Yields:
+            {"type": "token", "content": ...} events for each text chunk, then a
+            {"type": "done", ...} event with the full response, places and map data
+        """
+        if conversation_history is None:
+            conversation_history = []
+        conversation_history = self._trim_history(conversation_history)
 
-When users ask for directions:
-- Use the get_directions function with actual place names from search results"""
-            }
-        ]
+        cached = await chat_cache.get(message, conversation_history, user_location)
+        if cached is not None:
+            yield {"type": "token", "content": cached["response"]}
+            yield {"type": "done", **cached}
+            return
+
+        messages = self._build_messages(message, conversation_history, user_location)
+        calls: List[Dict[str, Any]] = []
+        parts: List[str] = []
+
+        async for token in self._stream_first_turn(messages, user_location, calls):
+            parts.append(token)
+            yield {"type": "token", "content": token}
+
+        if calls:
+            # Stream the final answer built from the function results
+            results = await asyncio.gather(*[call["task"] for call in calls])
+            messages.extend(self._tool_messages(calls, results))
+
+            stream = await self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                stream=True
+            )
+            parts = []
+            try:
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        parts.append(chunk.choices[0].delta.content)
+                        yield {"type": "token", "content": chunk.choices[0].delta.content}
+            finally:
+                # Return the connection to the pool even if the client disconnects mid-stream
+                await stream.response.aclose()
+
+            result = self._build_result("".join(parts), calls, results)
+            cacheable = self._all_succeeded(results)
+        else:
+            result = self._build_result("".join(parts))
+            cacheable = True
+
+        if cacheable:
+            await chat_cache.set(message, conversation_history, user_location, result)
+        yield {"type": "done", **result}
+
+    @staticmethod
+    def _trim_history(conversation_history: ConversationHistory) -> ConversationHistory:
+        """Keep only the last LLM_HISTORY_TURNS user/assistant turns"""
+        max_messages = 2 * settings.LLM_HISTORY_TURNS
+        if len(conversation_history) <= max_messages:
+            return conversation_history
+        return conversation_history[-max_messages:] if max_messages else []
+
+    def _build_messages(
+        self,
+        message: str,
+        conversation_history: ConversationHistory,
+        user_location: Optional[str]
+    ) -> List[Dict[str, Any]]:
+        """Build the message list for the first LLM call"""
+        messages = [{"role": "system", "content": _system_prompt(user_location)}]
 
         # Add conversation history
         for msg in conversation_history:
-            messages.append({"role": msg["role"], "content": msg["content"]})
+            if isinstance(msg, dict):
+                messages.append({"role": msg["role"], "content": msg["content"]})
+            else:
+                messages.append({"role": msg.role, "content": msg.content})
 
         # Add current user message
         messages.append({"role": "user", "content": message})
+        return messages
 
-        # First LLM call with function calling
-        response = self.client.chat.completions.create(
+    async def _stream_first_turn(
+        self,
+        messages: List[Dict[str, Any]],
+        user_location: Optional[str],
+        calls: List[Dict[str, Any]]
+    ) -> AsyncIterator[str]:
+        """
+        Stream the first LLM call, yielding text tokens
+
+        Each tool call the model makes is appended to `calls` with its id, name,
+        raw arguments and a task running it. A task is started as soon as its
+        streamed arguments form valid JSON, so Maps lookups overlap generation
+        and parallel tool calls run concurrently.
+        """
+        stream = await self.client.chat.completions.create(
             model=self.model,
             messages=messages,
-            functions=self.get_function_definitions(),
-            function_call="auto"
+            tools=self.get_function_definitions(),
+            tool_choice="auto",
+            stream=True
         )
 
-        assistant_message = response.choices[0].message
-        places_data = None
-        map_data = None
+        pending: Dict[int, Dict[str, Any]] = {}
+        try:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
 
-        # Check if LLM wants to call a function
-        if assistant_message.function_call:
-            function_name = assistant_message.function_call.name
-            function_args = json.loads(assistant_message.function_call.arguments)
+                if delta.content:
+                    yield delta.content
 
-            # Execute the function
-            function_result = self.execute_function(function_name, function_args, user_location)
+                for tool_call in delta.tool_calls or []:
+                    call = pending.setdefault(
+                        tool_call.index,
+                        {"id": f"call_{tool_call.index}", "name": "", "arguments": "", "task": None}
+                    )
+                    if tool_call.id:
+                        call["id"] = tool_call.id
+                    if tool_call.function:
+                        call["name"] += tool_call.function.name or ""
+                        call["arguments"] += tool_call.function.arguments or ""
 
-            # Add function call and result to messages
-            messages.append({
+                    # Early parse: start the function once its arguments are complete
+                    if call["task"] is None and call["name"] and call["arguments"].rstrip().endswith("}"):
+                        function_args = self._parse_arguments(call["arguments"])
+                        if function_args is not None:
+                            call["task"] = asyncio.create_task(
+                                self.execute_function(call["name"], function_args, user_location)
+                            )
+
+            for call in pending.values():
+                if call["task"] is not None:
+                    continue
+                function_args = self._parse_arguments(call["arguments"] or "{}")
+                if function_args is not None:
+                    call["task"] = asyncio.create_task(
+                        self.execute_function(call["name"], function_args, user_location)
+                    )
+                else:
+                    # Still answer this tool call so the other calls and the turn go on
+                    call["task"] = asyncio.get_running_loop().create_future()
+                    call["task"].set_result({"success": False, "error": "Invalid function arguments"})
+        except BaseException:
+            for call in pending.values():
+                if call["task"] is not None:
+                    call["task"].cancel()
+            raise
+        finally:
+            # Return the connection to the pool even if the stream is abandoned or fails
+            await stream.response.aclose()
+
+        calls.extend(pending[index] for index in sorted(pending))
+
+    @staticmethod
+    def _parse_arguments(arguments: str) -> Optional[Dict[str, Any]]:
+        """Parse tool call arguments, None unless they are a JSON object"""
+        try:
+            function_args = orjson.loads(arguments)
+        except ValueError:
+            return None
+        return function_args if isinstance(function_args, dict) else None
+
+    @staticmethod
+    def _tool_messages(calls: List[Dict[str, Any]], results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Build the assistant tool call message and one tool result message per call"""
+        messages = [
+            {
                 "role": "assistant",
                 "content": None,
-                "function_call": {
-                    "name": function_name,
-                    "arguments": assistant_message.function_call.arguments
+                "tool_calls": [
+                    {
+                        "id": call["id"],
+                        "type": "function",
+                        "function": {
+                            "name": call["name"],
+                            "arguments": call["arguments"]
+                        }
+                    }
+                    for call in calls
+                ]
+            }
+        ]
+
+        for call, function_result in zip(calls, results):
+            # Send a compact view of places to keep the prompt small
+            if function_result.get("places"):
+                with_details = call["name"] == "search_places_with_details"
+                function_result = {
+                    **function_result,
+                    "places": [_project_place(place, with_details) for place in function_result["places"]]
                 }
-            })
 
             messages.append({
-                "role": "function",
-                "name": function_name,
-                "content": json.dumps(function_result)
+                "role": "tool",
+                "tool_call_id": call["id"],
+                "content": orjson.dumps(function_result).decode()
             })
 
-            # Get final response from LLM with function results
-            second_response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages
-            )
+        return messages
 
-            final_response = second_response.choices[0].message.content
+    @staticmethod
+    def _all_succeeded(results: List[Dict[str, Any]]) -> bool:
+        """Whether every tool call succeeded, so the answer is safe to cache"""
+        return all(function_result.get("success") for function_result in results)
 
-            # Extract places or directions data for frontend
-            if function_name == "search_places" and function_result.get("success"):
-                places_data = function_result.get("places", [])
+    @staticmethod
+    def _build_result(
+        response: str,
+        calls: Optional[List[Dict[str, Any]]] = None,
+        results: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        """Build the chat result, extracting places or directions data for the frontend"""
+        places_data = None
+        map_data = None
 
-            elif function_name == "get_directions" and function_result.get("success"):
-                map_data = function_result.get("routes", [])
+        for call, function_result in zip(calls or [], results or []):
+            if not function_result.get("success"):
+                continue
 
-            return {
-                "response": final_response,
-                "places": places_data,
-                "map_data": map_data
-            }
+            if call["name"] in ("search_places", "search_places_with_details"):
+                places_data = (places_data or []) + function_result.get("places", [])
 
-        else:
+            elif call["name"] == "get_directions":
+                map_data = (map_data or []) + (function_result.get("routes") or [])
+
+        return {
+            "response": response,
+            "places": places_data,
+            "map_data": map_data
+        }
+
+    async def _run_chat(
+        self,
+        message: str,
+        conversation_history: ConversationHistory,
+        user_location: Optional[str]
+    ) -> Tuple[Dict[str, Any], bool]:
+        """
+        Run the full LLM and function calling flow for a chat message
+
+        Returns:
+            The chat result and whether it may be cached (no tool call failed)
+        """
+        messages = self._build_messages(message, conversation_history, user_location)
+
+        # First LLM call with function calling
+        calls: List[Dict[str, Any]] = []
+        parts = [token async for token in self._stream_first_turn(messages, user_location, calls)]
+
+        # Check if LLM wants to call a function
+        if not calls:
             # No function call needed, return direct response
-            return {
-                "response": assistant_message.content,
-                "places": None,
-                "map_data": None
-            }
+            return self._build_result("".join(parts)), True
+
+        results = await asyncio.gather(*[call["task"] for call in calls])
+        messages.extend(self._tool_messages(calls, results))
+
+        # Get final response from LLM with function results
+        second_response = await self.create_hedged(
+            model=self.model,
+            messages=messages
+        )
+
+        result = self._build_result(second_response.choices[0].message.content, calls, results)
+        return result, self._all_succeeded(results)
 
 # Singleton instance
 llm_service = LLMService()
@@ -1,14 +1,20 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
-from typing import Dict, Any
+from fastapi.responses import HTMLResponse, ORJSONResponse, StreamingResponse
+from contextlib import asynccontextmanager
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Any, AsyncIterator, Optional
+import hashlib
 import logging
+import queue
+import orjson
 
 from app.config import settings
 from app.models import ChatRequest, ChatResponse, PlaceSearchRequest, DirectionsRequest
 from app.llm_service import llm_service
-from app.maps_client import maps_client
+from app.maps_client import maps_client, canonical_location
 
 # Configure logging
 logging.basicConfig(
@@ -17,32 +23,113 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# httpx logs every request URL at INFO, and Maps requests carry the API key in the query string
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+def start_log_listener() -> QueueListener:
+    """
+    Move the root log handlers behind a queue drained by a background thread
+
+    While the app is running, log calls only enqueue records, so stream writes
+    never block the event loop. Undo with stop_log_listener().
+    """
+    root_logger = logging.getLogger()
+    listener = QueueListener(queue.SimpleQueue(), *root_logger.handlers, respect_handler_level=True)
+    root_logger.handlers = [QueueHandler(listener.queue)]
+    listener.start()
+    return listener
+
+def stop_log_listener(listener: QueueListener) -> None:
+    """Flush queued records and restore the original root log handlers"""
+    listener.stop()
+    logging.getLogger().handlers = list(listener.handlers)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open and pre-warm shared HTTP clients on startup, close them on shutdown"""
+    log_listener = start_log_listener()
+
+    # Load the frontend once instead of reading it on every request
+    try:
+        with open("static/index.html", "rb") as f:
+            app.state.index_html = f.read()
+        # Weak ETag: the same validator covers the identity and gzip-encoded bodies
+        app.state.index_etag = f'W/"{hashlib.md5(app.state.index_html, usedforsecurity=False).hexdigest()}"'
+    except FileNotFoundError:
+        app.state.index_html = None
+
+    maps_client.start()
+    llm_service.start()
+
+    # Pay the TCP/TLS handshake cost now instead of on the first real request
+    for name, warm_up in (("LLM backend", llm_service.warm_up), ("Google Maps", maps_client.warm_up)):
+        try:
+            await warm_up()
+        except Exception as e:
+            logger.warning(f"{name} warm-up failed: {str(e)}")
+
+    yield
+
+    await maps_client.close()
+    await llm_service.close()
+    stop_log_listener(log_listener)
+
+class ChatGZipMiddleware(GZipMiddleware):
+    """GZip middleware that leaves the chat event stream alone so each event is flushed immediately"""
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "http" and scope["path"] == "/api/chat/stream":
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
 # Initialize FastAPI app
 app = FastAPI(
     title="LLM Location Assistant",
     description="AI-powered location recommendations with Google Maps integration",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # Configure appropriately for production
+    allow_origins=[origin.strip() for origin in settings.CORS_ORIGINS.split(",") if origin.strip()],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    max_age=86400,  # Let browsers cache preflight responses for a day
 )
 
+# Compress JSON responses, Places payloads are often tens of KB
+app.add_middleware(ChatGZipMiddleware, minimum_size=1024)
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header (possibly a list) against an ETag"""
+    if not if_none_match:
+        return False
+    opaque_tag = etag.removeprefix("W/")
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == opaque_tag:
+            return True
+    return False
+
 @app.get("/")
-async def root():
+async def root(request: Request):
     """Serve the frontend HTML"""
-    try:
-        with open("static/index.html", "r", encoding="utf-8") as f:
-            return HTMLResponse(content=f.read())
-    except FileNotFoundError:
+    index_html = getattr(app.state, "index_html", None)
+    if index_html is None:
         return {"message": "LLM Location Assistant API", "docs": "/docs"}
 
-@app.post("/api/chat", response_model=ChatResponse)
+    headers = {"Cache-Control": "public, max-age=60", "ETag": app.state.index_etag}
+    if etag_matches(request.headers.get("if-none-match"), app.state.index_etag):
+        return Response(status_code=304, headers=headers)
+
+    return HTMLResponse(content=index_html, headers=headers)
+
+@app.post("/api/chat", response_model=ChatResponse, response_class=ORJSONResponse)
 async def chat_endpoint(request: ChatRequest) -> ChatResponse:
     """
     Main chat endpoint with LLM integration
@@ -52,16 +139,10 @@ async def chat_endpoint(request: ChatRequest) -> ChatResponse:
     try:
         logger.info(f"Chat request: {request.message}")
 
-        # Convert Pydantic models to dicts for LLM service
-        conversation_history = [
-            {"role": msg.role, "content": msg.content}
-            for msg in request.conversation_history
-        ]
-
         result = await llm_service.chat(
             message=request.message,
-            conversation_history=conversation_history,
-            user_location=request.user_location
+            conversation_history=request.conversation_history,
+            user_location=canonical_location(request.user_location)
         )
 
         return ChatResponse(
@@ -74,7 +155,35 @@ async def chat_endpoint(request: ChatRequest) -> ChatResponse:
         logger.error(f"Chat error: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Chat processing error: {str(e)}")
 
-@app.post("/api/places/search")
+@app.post("/api/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest) -> StreamingResponse:
+    """
+    Streaming chat endpoint
+
+    Sends the AI response as server-sent events while it is being generated
+    """
+    logger.info(f"Chat stream request: {request.message}")
+
+    async def event_stream() -> AsyncIterator[str]:
+        try:
+            async for event in llm_service.chat_stream(
+                message=request.message,
+                conversation_history=request.conversation_history,
+                user_location=canonical_location(request.user_location)
+            ):
+                yield f"data: {orjson.dumps(event).decode()}\n\n"
+        except Exception as e:
+            logger.error(f"Chat stream error: {str(e)}", exc_info=True)
+            error = {"type": "error", "detail": f"Chat processing error: {str(e)}"}
+            yield f"data: {orjson.dumps(error).decode()}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+@app.post("/api/places/search", response_class=ORJSONResponse)
 async def search_places_endpoint(request: PlaceSearchRequest) -> Dict[str, Any]:
     """
     Direct place search endpoint
@@ -84,24 +193,30 @@ async def search_places_endpoint(request: PlaceSearchRequest) -> Dict[str, Any]:
     try:
         logger.info(f"Place search: {request.query}")
 
-        places = maps_client.search_places(
+        places = await maps_client.search_places(
             query=request.query,
-            location=request.location,
+            location=canonical_location(request.location),
             radius=request.radius,
-            place_type=request.place_type
+            place_type=request.place_type,
+            limit=10
         )
 
+        if places is None:
+            raise HTTPException(status_code=502, detail="Place search failed")
+
         return {
             "success": True,
             "count": len(places),
-            "results": places[:10]  # Limit to 10 results
+            "results": places
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Place search error: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Place search error: {str(e)}")
 
-@app.get("/api/places/{place_id}")
+@app.get("/api/places/{place_id}", response_class=ORJSONResponse)
 async def get_place_details_endpoint(place_id: str) -> Dict[str, Any]:
     """
     Get detailed information about a specific place
@@ -109,7 +224,7 @@ async def get_place_details_endpoint(place_id: str) -> Dict[str, Any]:
     try:
         logger.info(f"Place details request: {place_id}")
 
-        details = maps_client.get_place_details(place_id)
+        details = await maps_client.get_place_details(place_id)
 
         if not details:
             raise HTTPException(status_code=404, detail="Place not found")
@@ -125,7 +240,7 @@ async def get_place_details_endpoint(place_id: str) -> Dict[str, Any]:
         logger.error(f"Place details error: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Place details error: {str(e)}")
 
-@app.post("/api/directions")
+@app.post("/api/directions", response_class=ORJSONResponse)
 async def get_directions_endpoint(request: DirectionsRequest) -> Dict[str, Any]:
     """
     Get directions between two locations
@@ -133,7 +248,7 @@ async def get_directions_endpoint(request: DirectionsRequest) -> Dict[str, Any]:
     try:
         logger.info(f"Directions request: {request.origin} -> {request.destination}")
 
-        directions = maps_client.get_directions(
+        directions = await maps_client.get_directions(
             origin=request.origin,
             destination=request.destination,
             mode=request.mode,
@@ -1,18 +1,131 @@
-import googlemaps
+import asyncio
+import logging
+import math
+import threading
+import time
+import httpx
+import orjson
 from typing import List, Dict, Any, Optional
+from cachetools import TTLCache
 from app.config import settings
 
+class _RateLimitFilter(logging.Filter):
+    """Drop repeats of the same log message within an interval to avoid log floods during outages"""
+
+    def __init__(self, interval: float = 10.0):
+        super().__init__()
+        self.interval = interval
+        self._last_emit: Dict[str, float] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        # Key on the unformatted message so the dict stays bounded by the number of call sites
+        now = time.monotonic()
+        last = self._last_emit.get(record.msg)
+        if last is not None and now - last < self.interval:
+            return False
+        self._last_emit[record.msg] = now
+        return True
+
+logger = logging.getLogger(__name__)
+logger.addFilter(_RateLimitFilter())
+
+class MapsApiError(Exception):
+    """Raised when the Google Maps API returns an error status"""
+
+def canonical_location(location: Optional[str], precision: int = 3) -> Optional[str]:
+    """
+    Round a "lat,lng" string so nearby users share cache entries
+
+    3 decimals is ~100 m, 4 decimals ~10 m. Anything that is not a coordinate
+    pair, such as an address, is returned unchanged; non-finite coordinates
+    ("nan,inf") are rejected and return None.
+    """
+    if not location:
+        return location
+    try:
+        lat, lng = (float(part) for part in location.split(","))
+    except ValueError:
+        return location
+    if not (math.isfinite(lat) and math.isfinite(lng)):
+        return None
+    return f"{round(lat, precision)},{round(lng, precision)}"
+
 class GoogleMapsClient:
     def __init__(self):
-        self.client = googlemaps.Client(key=settings.GOOGLE_MAPS_API_KEY)
+        self.api_key = settings.GOOGLE_MAPS_API_KEY
+        self._http: Optional[httpx.AsyncClient] = None
+
+        # Response caches
+        self._places_cache = TTLCache(maxsize=4096, ttl=300)
+        self._places_lock = threading.Lock()
+        self._directions_cache = TTLCache(maxsize=4096, ttl=300)
+        self._directions_lock = threading.Lock()
+        self._details_cache = TTLCache(maxsize=8192, ttl=3600)
+        self._details_lock = threading.Lock()
+        self._geo_cache = TTLCache(maxsize=8192, ttl=86400)
+        self._geo_lock = threading.Lock()
+
+    def start(self) -> None:
+        """Create the shared keep-alive HTTP client (called at app startup)"""
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                base_url="https://maps.googleapis.com",
+                limits=httpx.Limits(max_connections=50, keepalive_expiry=180),
+                http2=True,
+                timeout=5.0
+            )
+
+    async def warm_up(self) -> None:
+        """Open a keep-alive connection to Google so the first request skips the handshake"""
+        if self._http is None:
+            self.start()
+        # Unauthenticated, parameterless request: rejected by the API and not billed
+        await self._http.get("/maps/api/geocode/json")
 
-    def search_places(
+    async def close(self) -> None:
+        """Close the shared HTTP client (called at app shutdown)"""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def _get(self, path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Call a Maps REST endpoint and return the decoded JSON body"""
+        if self._http is None:
+            self.start()
+
+        params = {k: v for k, v in params.items() if v is not None}
+        params["key"] = self.api_key
+
+        response = await self._http.get(path, params=params)
+        # Not raise_for_status(): httpx errors embed the request URL, which carries the API key
+        if response.is_error:
+            raise MapsApiError(f"HTTP {response.status_code}")
+        # orjson decodes the raw bytes directly, skipping httpx's text decoding and stdlib json
+        body = orjson.loads(response.content)
+
+        status = body.get("status")
+        if status not in ("OK", "ZERO_RESULTS"):
+            raise MapsApiError(f"{status}: {body.get('error_message', '')}")
+        return body
+
+    @staticmethod
+    def _cache_get(cache: TTLCache, lock: threading.Lock, key: Any) -> Any:
+        with lock:
+            return cache.get(key)
+
+    @staticmethod
+    def _cache_set(cache: TTLCache, lock: threading.Lock, key: Any, value: Any) -> None:
+        with lock:
+            cache[key] = value
+
+    async def search_places(
         self,
         query: str,
         location: Optional[str] = None,
         radius: int = 5000,
-        place_type: Optional[str] = None
-    ) -> List[Dict[str, Any]]:
+        place_type: Optional[str] = None,
+        limit: int = 20
+    ) -> Optional[List[Dict[str, Any]]]:
         """
         Search for places using Google Places API
 
@@ -21,25 +134,33 @@ class GoogleMapsClient:
             location: Location as string or lat/lng
             radius: Search radius in meters (default 5000m = 5km)
             place_type: Type of place (e.g., 'restaurant', 'cafe')
+            limit: Maximum number of results to return
 
         Returns:
-            List of place results
+            List of place results (empty when nothing matched) or None on error
         """
+        key = ((query or "").lower().strip(), canonical_location(location, precision=4), radius, place_type)
+        cached = self._cache_get(self._places_cache, self._places_lock, key)
+        if cached is not None:
+            return cached[:limit]
+
         try:
             # Use text search for more flexible queries
-            results = self.client.places(
-                query=query,
-                location=location,
-                radius=radius,
-                type=place_type
-            )
+            results = await self._get("/maps/api/place/textsearch/json", {
+                "query": query,
+                "location": location,
+                "radius": radius,
+                "type": place_type
+            })
 
-            return results.get('results', [])
+            places = results.get('results', [])
+            self._cache_set(self._places_cache, self._places_lock, key, places)
+            return places[:limit]
         except Exception as e:
-            print(f"Error searching places: {e}")
-            return []
+            logger.warning("search_places failed: %s", e)
+            return None
 
-    def get_place_details(self, place_id: str) -> Optional[Dict[str, Any]]:
+    async def get_place_details(self, place_id: str) -> Optional[Dict[str, Any]]:
         """
         Get detailed information about a specific place
 
@@ -49,14 +170,51 @@ class GoogleMapsClient:
         Returns:
             Place details or None
         """
+        cached = self._cache_get(self._details_cache, self._details_lock, place_id)
+        if cached is not None:
+            return cached
+
         try:
-            result = self.client.place(place_id=place_id)
-            return result.get('result')
+            result = await self._get("/maps/api/place/details/json", {"place_id": place_id})
+            details = result.get('result')
+            if details:
+                self._cache_set(self._details_cache, self._details_lock, place_id, details)
+            return details
         except Exception as e:
-            print(f"Error getting place details: {e}")
+            logger.warning("get_place_details failed: %s", e)
+            return None
+
+    async def get_places_with_details(
+        self,
+        query: str,
+        location: Optional[str] = None,
+        radius: int = 5000,
+        place_type: Optional[str] = None,
+        limit: int = 5
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Search for places and fetch details for the top results concurrently
+
+        Args:
+            query: Search query (e.g., "restaurants near me")
+            location: Location as string or lat/lng
+            radius: Search radius in meters (default 5000m = 5km)
+            place_type: Type of place (e.g., 'restaurant', 'cafe')
+            limit: Number of top results to fetch details for
+
+        Returns:
+            List of place details, falling back to the search result when details fail,
+            or None if the search itself failed
+        """
+        places = await self.search_places(query, location, radius, place_type, limit=limit)
+        if places is None:
             return None
+        details = await asyncio.gather(*[
+            self.get_place_details(place["place_id"]) for place in places
+        ])
+        return [detail or place for place, detail in zip(places, details)]
 
-    def get_directions(
+    async def get_directions(
         self,
         origin: str,
         destination: str,
@@ -75,19 +233,27 @@ class GoogleMapsClient:
         Returns:
             List of route options or None
         """
+        key = (canonical_location(origin, precision=4), canonical_location(destination, precision=4), mode, alternatives)
+        cached = self._cache_get(self._directions_cache, self._directions_lock, key)
+        if cached is not None:
+            return cached
+
         try:
-            result = self.client.directions(
-                origin=origin,
-                destination=destination,
-                mode=mode,
-                alternatives=alternatives
-            )
+            body = await self._get("/maps/api/directions/json", {
+                "origin": origin,
+                "destination": destination,
+                "mode": mode,
+                "alternatives": "true" if alternatives else "false"
+            })
+            result = body.get('routes', [])
+            if result:
+                self._cache_set(self._directions_cache, self._directions_lock, key, result)
             return result
         except Exception as e:
-            print(f"Error getting directions: {e}")
+            logger.warning("get_directions failed: %s", e)
             return None
 
-    def geocode(self, address: str) -> Optional[Dict[str, Any]]:
+    async def geocode(self, address: str) -> Optional[Dict[str, Any]]:
         """
         Convert address to coordinates
 
@@ -97,14 +263,22 @@ class GoogleMapsClient:
         Returns:
             Geocoding result or None
         """
+        key = ("geocode", (address or "").lower().strip())
+        cached = self._cache_get(self._geo_cache, self._geo_lock, key)
+        if cached is not None:
+            return cached
+
         try:
-            result = self.client.geocode(address)
-            return result[0] if result else None
+            result = (await self._get("/maps/api/geocode/json", {"address": address})).get('results')
+            if not result:
+                return None
+            self._cache_set(self._geo_cache, self._geo_lock, key, result[0])
+            return result[0]
         except Exception as e:
-            print(f"Error geocoding address: {e}")
+            logger.warning("geocode failed: %s", e)
             return None
 
-    def reverse_geocode(self, lat: float, lng: float) -> Optional[str]:
+    async def reverse_geocode(self, lat: float, lng: float) -> Optional[str]:
         """
         Convert coordinates to address
 
@@ -115,11 +289,20 @@ class GoogleMapsClient:
         Returns:
             Address string or None
         """
+        key = ("reverse", canonical_location(f"{lat},{lng}", precision=4))
+        cached = self._cache_get(self._geo_cache, self._geo_lock, key)
+        if cached is not None:
+            return cached
+
         try:
-            result = self.client.reverse_geocode((lat, lng))
-            return result[0]['formatted_address'] if result else None
+            result = (await self._get("/maps/api/geocode/json", {"latlng": f"{lat},{lng}"})).get('results')
+            if not result:
+                return None
+            address = result[0]['formatted_address']
+            self._cache_set(self._geo_cache, self._geo_lock, key, address)
+            return address
         except Exception as e:
-            print(f"Error reverse geocoding: {e}")
+            logger.warning("reverse_geocode failed: %s", e)
             return None
 
 # Singleton instance
@@ -1,10 +1,13 @@
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Sequence, Union
 
 class ChatMessage(BaseModel):
     role: str  # 'user', 'assistant', 'system'
     content: str
 
+# Chat history as received from the API or as plain {"role", "content"} dicts
+ConversationHistory = Sequence[Union[ChatMessage, Dict[str, str]]]
+
 class ChatRequest(BaseModel):
     message: str
     conversation_history: Optional[List[ChatMessage]] = []
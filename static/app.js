@@ -58,8 +58,10 @@ async function sendMessage() {
     const sendBtn = document.getElementById('send-btn');
     sendBtn.disabled = true;
 
+    let messageDiv = null;
+
     try {
-        const response = await fetch('/api/chat', {
+        const response = await fetch('/api/chat/stream', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -75,10 +77,13 @@ async function sendMessage() {
             throw new Error(`API error: ${response.status}`);
         }
 
-        const data = await response.json();
-
-        // Add assistant response to chat
-        addMessage('assistant', data.response);
+        // Render the assistant response as it streams in
+        messageDiv = addMessage('assistant', '');
+        const data = await readChatStream(response, (token) => {
+            messageDiv.textContent += token;
+            messageDiv.parentElement.scrollTop = messageDiv.parentElement.scrollHeight;
+        });
+        messageDiv.textContent = data.response;
 
         // Update conversation history
         conversationHistory.push({ role: 'user', content: message });
@@ -97,12 +102,48 @@ async function sendMessage() {
 
     } catch (error) {
         console.error('Error:', error);
+        // Drop the empty or partial streamed reply before showing the error
+        if (messageDiv) {
+            messageDiv.remove();
+        }
         addMessage('assistant', 'Sorry, I encountered an error. Please try again.');
     } finally {
         sendBtn.disabled = false;
     }
 }
 
+// Read server-sent chat events, calling onToken for each text chunk
+// Resolves with the final "done" event
+async function readChatStream(response, onToken) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+
+        for (const raw of events) {
+            if (!raw.startsWith('data: ')) continue;
+            const event = JSON.parse(raw.slice(6));
+
+            if (event.type === 'token') {
+                onToken(event.content);
+            } else if (event.type === 'done') {
+                return event;
+            } else if (event.type === 'error') {
+                throw new Error(event.detail);
+            }
+        }
+    }
+
+    throw new Error('Chat stream ended unexpectedly');
+}
+
 // Quick message buttons
 function quickMessage(message) {
     document.getElementById('user-input').value = message;
@@ -118,6 +159,8 @@ function addMessage(role, content) {
 
     messagesContainer.appendChild(messageDiv);
     messagesContainer.scrollTop = messagesContainer.scrollHeight;
+
+    return messageDiv;
 }
 
 // Display places in the UI